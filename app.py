@@ -1,47 +1,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from PIL import Image
 import base64
 from io import BytesIO
+from functools import partial
 import datetime
 import re
 import os
 
-# Load measurement images and Brafe logo with error handling
-try:
-    x_img = Image.open('x_measurement.png')
-except FileNotFoundError:
-    x_img = None
-    st.warning("Image 'x_measurement.png' not found. Using placeholder.")
-try:
-    y_img = Image.open('y_measurement.png')
-except FileNotFoundError:
-    y_img = None
-    st.warning("Image 'y_measurement.png' not found. Using placeholder.")
-try:
-    z_img = Image.open('z_measurement.png')
-except FileNotFoundError:
-    z_img = None
-    st.warning("Image 'z_measurement.png' not found. Using placeholder.")
-try:
-    brafe_logo = Image.open('brafe_logo.png')
-except FileNotFoundError:
-    brafe_logo = None
-    st.warning("Image 'brafe_logo.png' not found. Using placeholder.")
-
-# App configuration with updated blue theme
-st.set_page_config(
-    page_title="Brafe Engineering Quality Control",
-    page_icon=brafe_logo if brafe_logo else ":bar_chart:",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
 
-# Custom CSS for blue Brafe theme
-st.markdown(
-    """
+# Custom CSS for blue Brafe theme. It is re-emitted on every run because Streamlit
+# drops any element a rerun does not render again.
+APP_CSS = """
     <style>
     .stApp {
         background-color: #e6f0f9;
@@ -74,7 +45,8 @@ st.markdown(
         background-color: #ffcccc;
         padding: 5px;
         border-radius: 3px;
-        animation: pulse 1s infinite;
+        animation: pulse 1.5s 6;
+        will-change: transform;
         color: #cc0000;
     }
     .pass-metric {
@@ -100,10 +72,652 @@ st.markdown(
         background-color: #f0f7ff;
     }
     </style>
-    """,
-    unsafe_allow_html=True
+"""
+
+IMAGE_FILES = {
+    'x': 'x_measurement.png',
+    'y': 'y_measurement.png',
+    'z': 'z_measurement.png',
+    'logo': 'brafe_logo.png'
+}
+
+# Largest size each image is ever displayed at (2x for high-DPI screens); the logo is
+# shown 150 px wide in the sidebar, the measurement images in one of three columns
+IMAGE_MAX_SIZES = {
+    'x': (600, 600),
+    'y': (600, 600),
+    'z': (600, 600),
+    'logo': (300, 300)
+}
+
+# Bend test file names look like 2025_0731_1110221A(1).csv: date, part identifier, (job no)
+FILENAME_PART_RE = re.compile(r'([^_]*_[^_]*)_([^_(]*)')
+FILENAME_JOB_RE = re.compile(r'\(([^()]*)')
+
+# Traces shorter than this get a sparkline in the Data sheet instead of a line chart
+MIN_CHART_POINTS = 50
+
+# Characters Excel does not allow in worksheet names
+SHEET_NAME_INVALID_RE = re.compile(r'[\[\]:*?/\\]')
+
+# Excel cell format specs, shared by every report build so only the cheap
+# add_format() registration happens per workbook
+BEND_REPORT_FORMATS = {
+    'title': {
+        'font_name': 'Calibri',
+        'font_size': 18,
+        'bold': True,
+        'align': 'center',
+        'valign': 'vcenter',
+        'bottom': 6
+    },
+    'header': {
+        'font_name': 'Calibri',
+        'font_size': 12,
+        'bold': True,
+        'bg_color': '#003366',
+        'font_color': 'white',
+        'border': 1,
+        'align': 'center',
+        'valign': 'vcenter'
+    },
+    'subheader': {
+        'font_name': 'Calibri',
+        'font_size': 14,
+        'bold': True,
+        'align': 'left'
+    },
+    'info': {
+        'font_name': 'Calibri',
+        'font_size': 11,
+        'align': 'left',
+        'text_wrap': True
+    },
+    'parameter': {
+        'font_name': 'Calibri',
+        'font_size': 11,
+        'bold': True,
+        'align': 'left',
+        'bg_color': '#e6f0f9'
+    },
+    'value': {
+        'font_name': 'Calibri',
+        'font_size': 11,
+        'align': 'left',
+        'border': 1
+    },
+    'number': {
+        'font_name': 'Calibri',
+        'font_size': 11,
+        'num_format': '0.00',
+        'align': 'left',
+        'border': 1
+    },
+    'pass': {
+        'font_color': '#155724',
+        'bg_color': '#d4edda',
+        'border': 1
+    },
+    'fail': {
+        'font_color': '#721c24',
+        'bg_color': '#f8d7da',
+        'border': 1
+    },
+    'pass_borderless': {
+        'font_color': '#155724',
+        'bg_color': '#d4edda'
+    },
+    'fail_borderless': {
+        'font_color': '#721c24',
+        'bg_color': '#f8d7da'
+    }
+}
+
+LOI_REPORT_FORMATS = {
+    'header': {
+        'bold': True,
+        'bg_color': '#003366',
+        'font_color': 'white',
+        'border': 1
+    },
+    'pass': {
+        'bg_color': '#d4edda',
+        'font_color': '#155724'
+    },
+    'fail': {
+        'bg_color': '#f8d7da',
+        'font_color': '#721c24'
+    }
+}
+
+
+@st.cache_resource(show_spinner=False)
+def load_images():
+    """Pre-size and PNG-encode the measurement images and logo once per process; missing files map to None."""
+    images = {}
+    for name, path in IMAGE_FILES.items():
+        try:
+            # copy() forces the full decode so the file handle can be closed
+            with Image.open(path) as img:
+                image = img.copy()
+        except FileNotFoundError:
+            images[name] = None
+            continue
+        # Pre-size once so reruns never ship full-resolution pixels to the browser
+        image.thumbnail(IMAGE_MAX_SIZES[name], Image.LANCZOS)
+        # Streamlit re-encodes PIL images on every st.image call but passes bytes through
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        images[name] = buffer.getvalue()
+    return images
+
+
+def decimate(x, y, target=2000):
+    """Min/max decimate a trace to about `target` points so every bucket keeps its peak."""
+    n = len(x)
+    if n <= target:
+        return x, y
+    step = -(-n // (target // 2))  # ceil division: each bucket contributes a min and a max
+    starts = np.arange(0, n, step)
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    return np.repeat(x[starts], 2), np.column_stack([lows, highs]).ravel()
+
+
+def compute_loi(t1, w1, t2):
+    """Return (mass loss, LOI %) for scalar or array-like scale readings in g."""
+    # The manual's formula, which uses absolute values of tared bowl weights,
+    # is not standard but is implemented as specified.
+    delta_m = np.abs((np.abs(t2) - np.abs(t1)) - w1)
+    return delta_m, delta_m / w1 * 100
+
+
+def force_chart(x, y, max_force, filename):
+    """Build the interactive force progression chart with a dashed line at the maximum force."""
+    # Imported here so sessions that never plot a bend test skip the Altair import
+    import altair as alt
+
+    trace = pd.DataFrame({'Data Point Index': x, 'Force (N)': y})
+    line = alt.Chart(trace).mark_line(color='#00509d').encode(
+        x='Data Point Index:Q',
+        y='Force (N):Q'
+    )
+    peak = alt.Chart(pd.DataFrame({'Max Force (N)': [max_force]})).mark_rule(
+        color='red', strokeDash=[6, 4]
+    ).encode(y='Max Force (N):Q')
+    return (line + peak).properties(
+        title=f'Force Progression for {filename}',
+        height=350
+    ).interactive()
+
+
+def parse_bend_csv(raw):
+    """Parse the raw bytes of an uploaded bend test CSV into a header-less frame."""
+    try:
+        # pyarrow's multi-threaded reader; ships with Streamlit
+        df = pd.read_csv(BytesIO(raw), header=None, engine='pyarrow')
+    except (ImportError, ValueError):
+        # pyarrow unavailable, or a ragged file its stricter parser rejects
+        df = pd.read_csv(BytesIO(raw), header=None)
+    
+    # Fix for files with trailing commas (like the example)
+    # Remove any empty columns at the end
+    return df.dropna(axis=1, how='all')
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_bend_data(raw):
+    """Parse and clean a bend test CSV; returns the trimmed frame and its peak force.
+
+    Cached on the raw bytes only, so editing a bar's dimensions never re-parses its file.
+    The cache holds the most recent 32 files so a long-running server stays bounded.
+    Files with fewer than 6 columns come back as parsed with a peak force of None.
+    """
+    df = parse_bend_csv(raw)
+    if len(df.columns) < 6:
+        return df, None
+    
+    # Rename columns - 6th column (index 5) is the force, named in place rather than copied
+    df.columns = ['force_n' if i == 5 else f'col_{i}' for i in range(len(df.columns))]
+    
+    # Build one row mask over the force values instead of re-filtering the frame per step
+    force = pd.to_numeric(df['force_n'], errors='coerce')
+    values = force.to_numpy(dtype=np.float64)
+    
+    # 1. Remove missing, infinite and negative values (force should be positive)
+    keep = np.isfinite(values) & (values >= 0)
+    
+    # 2. Remove extreme outliers (more than 3 std devs from mean)
+    kept = values[keep]
+    if kept.size > 1:
+        mean_force = kept.mean()
+        std_force = kept.std(ddof=1)
+        if std_force > 0:  # Avoid division by zero
+            keep &= values <= mean_force + 3 * std_force
+    
+    # 3. Remove values that are too high before the main test starts
+    # Find the first significant force value (>1% of max)
+    max_force = None
+    if keep.any():
+        max_force = values[keep].max()
+        threshold = max_force * 0.01
+        significant = np.flatnonzero(keep & (values > threshold))
+        if significant.size:
+            keep[:significant[0]] = False
+    
+    df = df[keep].assign(force_n=force[keep]).replace([np.inf, -np.inf], np.nan)
+    
+    # Trimming the lead-in never drops the maximum, so the step 3 value is the peak force
+    return df, max_force
+
+
+def add_formats(workbook, specs):
+    """Register each format spec on the workbook and return the Format objects by name."""
+    return {name: workbook.add_format(spec) for name, spec in specs.items()}
+
+
+def add_status_highlight(worksheet, first_row, last_row, col, pass_format, fail_format,
+                         other_is_fail=False):
+    """Colour Pass/Fail status cells in a column range with two conditional formats.
+
+    With other_is_fail, any value without 'Pass' (e.g. 'N/A') gets the fail format too.
+    """
+    fail_rule = ('not containing', 'Pass') if other_is_fail else ('containing', 'Fail')
+    for (criteria, text), cell_format in ((('containing', 'Pass'), pass_format), (fail_rule, fail_format)):
+        worksheet.conditional_format(first_row, col, last_row, col, {
+            'type': 'text',
+            'criteria': criteria,
+            'value': text,
+            'format': cell_format
+        })
+
+
+def write_numeric_block(worksheet, first_row, values, cell_format):
+    """Write a 2-D float array starting at column A, one write_row call per row; NaN cells stay blank."""
+    write_row = worksheet.write_row
+    missing = np.isnan(values)
+    if missing.any():
+        # write_row turns None into a formatted blank cell
+        values = values.astype(object)
+        values[missing] = None
+    for row_idx, row in enumerate(values.tolist(), start=first_row):
+        write_row(row_idx, 0, row, cell_format)
+
+
+def write_test_sheets(workbook, filename, df, file_result, test_id, operator_name, test_date, formats):
+    """Add the parameter and raw-data sheets for one bend test file to the report workbook."""
+    # Imported here so xlsxwriter only loads once a report is actually built
+    from xlsxwriter.utility import quote_sheetname
+
+    title_format = formats['title']
+    header_format = formats['header']
+    parameter_format = formats['parameter']
+    value_format = formats['value']
+    number_format = formats['number']
+    pass_format = formats['pass']
+    fail_format = formats['fail']
+
+    # Create base name for sheets
+    base_name = SHEET_NAME_INVALID_RE.sub('_', filename)[:20]
+    
+    # Create parameter sheet
+    param_sheet_name = base_name + "_Params"
+    param_sheet = workbook.add_worksheet(param_sheet_name[:31])
+    
+    # Add header
+    param_sheet.merge_range('A1:C1', f'Test Parameters: {filename}', title_format)
+    param_sheet.write_row(2, 0, ['Parameter', 'Value', 'Status'], header_format)
+    
+    # Prepare parameters
+    test_params = [
+        ("Test ID", test_id, ""),
+        ("Operator", operator_name, ""),
+        ("Test Date", test_date, ""),
+        ("Part ID", file_result.get('Part ID', 'N/A'), ""),
+        ("Job No", file_result.get('Job No', 'N/A'), ""),
+        ("Support Span (L)", f"{file_result.get('L (mm)', 0):.1f} mm", ""),
+        ("Width (b)", f"{file_result.get('b (mm)', 0):.1f} mm", ""),
+        ("Height (h)", f"{file_result.get('h (mm)', 0):.1f} mm", ""),
+        ("Max Force", f"{file_result.get('Max Force (N)', 0):.2f} N", ""),
+        ("Bending Strength", f"{file_result.get('Bending Strength (N/cm²)', 0):.2f} N/cm²", ""),
+        ("Status", "", file_result.get('Status', 'N/A'))
+    ]
+    
+    # Write parameters
+    for row_idx, (param, value, status) in enumerate(test_params, start=3):
+        param_sheet.write(row_idx, 0, param, parameter_format)
+        param_sheet.write(row_idx, 1, value, value_format)
+        param_sheet.write(row_idx, 2, status, value_format)
+    
+    # Apply status formatting to the Status row only; a missing status shows as a failure
+    status_row = 2 + len(test_params)
+    add_status_highlight(param_sheet, status_row, status_row, 2, pass_format, fail_format,
+                         other_is_fail=True)
+    
+    # Set column widths
+    param_sheet.set_column('A:A', 25)
+    param_sheet.set_column('B:B', 20)
+    param_sheet.set_column('C:C', 15)
+    
+    # Create raw data sheet
+    data_sheet_name = base_name + "_Data"
+    raw_sheet = workbook.add_worksheet(data_sheet_name[:31])
+    
+    # Write raw data headers
+    headers = df.columns.tolist()
+    raw_sheet.set_column(0, len(headers) - 1, 15)
+    
+    # Add header, merged only across the data columns rather than A1:Z1
+    raw_sheet.set_row(0, 22)
+    raw_sheet.merge_range(0, 0, 0, len(headers) - 1, f'Raw Test Data: {filename}', title_format)
+    raw_sheet.write_row(2, 0, headers, header_format)
+    
+    # Write raw data
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        write_numeric_block(raw_sheet, 3, df.to_numpy(dtype=np.float64), number_format)
+    else:
+        # itertuples yields plain tuples without boxing mixed dtypes
+        write_number = raw_sheet.write_number
+        write_string = raw_sheet.write_string
+        write_blank = raw_sheet.write_blank
+        # Numeric columns always hold numbers, so only object columns need a per-cell check
+        numeric_columns = [pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes]
+        for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=3):
+            for col_idx, (value, is_numeric) in enumerate(zip(row, numeric_columns)):
+                if is_numeric or isinstance(value, (int, float, np.number)):
+                    if value != value:
+                        # Missing fields (NaN, also in string columns) stay blank
+                        write_blank(row_idx, col_idx, None, number_format)
+                    else:
+                        write_number(row_idx, col_idx, value, number_format)
+                elif isinstance(value, str):
+                    write_string(row_idx, col_idx, value, value_format)
+                else:
+                    write_string(row_idx, col_idx, str(value), value_format)
+    
+    # Freeze header row
+    raw_sheet.freeze_panes(3, 0)
+    
+    # Add chart; short traces get an in-cell sparkline instead of a full chart drawing.
+    # Both sit in the first free column right of the table, level with the first data row.
+    chart_col = len(headers) + 1
+    if len(df) >= MIN_CHART_POINTS:
+        chart = workbook.add_chart({'type': 'line'})
+        chart.add_series({
+            'values': [data_sheet_name, 3, 5, 2 + len(df), 5],
+            'name': 'Force (N)',
+            'line': {'color': '#003366', 'width': 1.5}
+        })
+        
+        # Find max force position; cleaning keeps the CSV's row labels, so use the position
+        max_index = int(df['force_n'].to_numpy().argmax()) + 3  # +3 for header offset
+        
+        # Add max force marker
+        chart.add_series({
+            'values': [data_sheet_name, max_index, 5, max_index, 5],
+            'name': 'Max Force',
+            'marker': {'type': 'circle', 'size': 6, 'fill': {'color': '#FF0000'}},
+            'line': {'none': True}
+        })
+        
+        chart.set_title({'name': f'Force Progression: {filename}'})
+        chart.set_x_axis({'name': 'Data Point Index'})
+        chart.set_y_axis({'name': 'Force (N)'})
+        chart.set_legend({'position': 'top'})
+        
+        # Insert chart beside the data
+        raw_sheet.insert_chart(3, chart_col, chart)
+    elif not df.empty:
+        raw_sheet.add_sparkline(3, chart_col, {
+            'range': f"{quote_sheetname(data_sheet_name)}!F4:F{len(df) + 3}",
+            'markers': True,
+            'high_point': True
+        })
+
+
+def build_bend_report(results, dfs, operator_name, test_id, nominal_strength, generated_at):
+    """Build the combined bend test Excel report and return the workbook bytes."""
+    output = BytesIO()
+    # constant_memory flushes each row as soon as the next one starts, so every sheet
+    # below must be written strictly top to bottom; missing values are written as
+    # blanks, and any NaN or inf that slips through becomes #NUM! instead of aborting
+    with pd.ExcelWriter(output, engine='xlsxwriter',
+                        engine_kwargs={'options': {'constant_memory': True,
+                                                   'nan_inf_to_errors': True}}) as writer:
+        # Get the workbook object
+        workbook = writer.book
+
+        # ===================================================
+        # ========== Create Professional Front Page ==========
+        # ===================================================
+        front_sheet = workbook.add_worksheet('Test Summary')
+
+        # Register the report formats
+        formats = add_formats(workbook, BEND_REPORT_FORMATS)
+        title_format = formats['title']
+        header_format = formats['header']
+        subheader_format = formats['subheader']
+        info_format = formats['info']
+        parameter_format = formats['parameter']
+        value_format = formats['value']
+        number_format = formats['number']
+        pass_format = formats['pass']
+        fail_format = formats['fail']
+
+        # Set column widths
+        front_sheet.set_column('A:A', 2)  # Padding
+        front_sheet.set_column('B:B', 25)  # Labels
+        front_sheet.set_column('C:C', 25)  # Values
+        front_sheet.set_column('D:D', 2)  # Padding
+
+        # Add title and company info; one timestamp so the generated time and test date agree
+        front_sheet.merge_range('B1:D1', 'Brafe Engineering - Bend Test Report', title_format)
+        front_sheet.merge_range('B3:D3', 'Quality Control Department', info_format)
+        front_sheet.merge_range('B4:D4', f"Report Generated: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}", info_format)
+
+        # Add test parameters section
+        front_sheet.merge_range('B6:D6', 'Test Parameters', subheader_format)
+
+        # Add parameter table
+        test_date = generated_at.strftime('%Y-%m-%d')
+        parameters = [
+            ("Test ID", test_id),
+            ("Operator", operator_name),
+            ("Test Date", test_date),
+            ("Nominal Strength", f"{nominal_strength} N/cm²")
+        ]
+
+        for row_idx, (param, value) in enumerate(parameters, start=7):
+            front_sheet.write(row_idx, 1, param, parameter_format)
+            front_sheet.write(row_idx, 2, value, value_format)
+
+        # Add test summary section
+        front_sheet.merge_range('B13:D13', 'Test Results Summary', subheader_format)
+
+        # Add summary table if results exist
+        if results:
+            # Write headers
+            headers = ["Filename", "Part ID", "Job No", "Strength (N/cm²)", "Status"]
+            front_sheet.write_row(14, 1, headers, header_format)
+
+            # Write data
+            for row_idx, result in enumerate(results, start=15):
+                front_sheet.write(row_idx, 1, result['Filename'], value_format)
+                front_sheet.write(row_idx, 2, result['Part ID'], value_format)
+                front_sheet.write(row_idx, 3, result['Job No'], value_format)
+                front_sheet.write_number(row_idx, 4, result['Bending Strength (N/cm²)'], number_format)
+                front_sheet.write(row_idx, 5, result['Status'], value_format)
+
+            # Colour the whole Status column with two rules instead of a format per row
+            add_status_highlight(front_sheet, 15, 14 + len(results), 5, pass_format, fail_format)
+
+            # Add statistics
+            strengths = np.fromiter((r['Bending Strength (N/cm²)'] for r in results),
+                                    dtype=np.float64, count=len(results))
+            if strengths.size:
+                avg_strength = strengths.mean()
+                min_strength = strengths.min()
+                max_strength = strengths.max()
+
+                front_sheet.merge_range(f'B{16+len(results)}:C{16+len(results)}', 'Average Strength', parameter_format)
+                front_sheet.write_number(15+len(results), 4, avg_strength, number_format)
+
+                front_sheet.merge_range(f'B{17+len(results)}:C{17+len(results)}', 'Minimum Strength', parameter_format)
+                front_sheet.write_number(16+len(results), 4, min_strength, number_format)
+
+                front_sheet.merge_range(f'B{18+len(results)}:C{18+len(results)}', 'Maximum Strength', parameter_format)
+                front_sheet.write_number(17+len(results), 4, max_strength, number_format)
+
+        # Add footer note
+        note = "Note: Complete test data available in subsequent sheets"
+        front_sheet.merge_range(f'B{20+len(results)}:D{20+len(results)}', note, info_format)
+
+        # ===================================================
+        # ========== Create Breaking Force Sheet =============
+        # ===================================================
+        if results:
+            breaking_force_sheet = workbook.add_worksheet('Breaking Force')
+
+            # Create header
+            breaking_force_sheet.merge_range('A1:E1', 'Breaking Force Measurements', title_format)
+            breaking_force_sheet.write_row(2, 0, ['Filename', 'Part ID', 'Job No', 'Max Force (N)', 'Status'], header_format)
+
+            # Write data
+            for row_idx, result in enumerate(results, start=3):
+                breaking_force_sheet.write(row_idx, 0, result['Filename'], value_format)
+                breaking_force_sheet.write(row_idx, 1, result['Part ID'], value_format)
+                breaking_force_sheet.write(row_idx, 2, result['Job No'], value_format)
+                breaking_force_sheet.write_number(row_idx, 3, result['Max Force (N)'], number_format)
+                breaking_force_sheet.write(row_idx, 4, result['Status'])
+
+            # Apply conditional formatting for status
+            add_status_highlight(breaking_force_sheet, 3, 2 + len(results), 4,
+                                 formats['pass_borderless'], formats['fail_borderless'])
+
+            # Format columns
+            breaking_force_sheet.set_column('A:A', 30)
+            breaking_force_sheet.set_column('B:B', 20)
+            breaking_force_sheet.set_column('C:C', 15)
+            breaking_force_sheet.set_column('D:D', 15)
+            breaking_force_sheet.set_column('E:E', 10)
+
+        # ===================================================
+        # ========== Create Sheets for Each Test ============
+        # ===================================================
+        if results and dfs:
+            results_by_file = {r['Filename']: r for r in results}
+            for filename, df in dfs:
+                # Get specific values for this file
+                file_result = results_by_file.get(filename, {})
+                write_test_sheets(workbook, filename, df, file_result,
+                                  test_id, operator_name, test_date, formats)
+
+    return output.getvalue()
+
+
+def build_loi_report(loi_results, method, operator_name, test_id, generated_at):
+    """Build the LOI Excel report in the Brafe template format and return the workbook bytes."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        # Create summary sheet; ten rows are written directly rather than through to_excel
+        workbook = writer.book
+        summary_sheet = workbook.add_worksheet('Test Summary')
+        summary_rows = [
+            ('Test Date', generated_at.strftime('%Y-%m-%d')),
+            ('Operator', operator_name),
+            ('Test ID', test_id),
+            ('Method', method),
+            ('T1 (g)', loi_results['t1']),
+            ('W1 (g)', loi_results['w1']),
+            ('T2 (g)', loi_results['t2']),
+            ('Mass Loss (g)', loi_results['delta_m']),
+            ('LOI (%)', loi_results['loi']),
+            ('Status', loi_results['status'])
+        ]
+
+        # Formatting
+        formats = add_formats(workbook, LOI_REPORT_FORMATS)
+        header_format = formats['header']
+        pass_format = formats['pass']
+        fail_format = formats['fail']
+
+        summary_sheet.write_row(0, 0, ['Parameter', 'Value'], header_format)
+        for row_idx, (parameter, value) in enumerate(summary_rows, start=1):
+            summary_sheet.write(row_idx, 0, parameter)
+            summary_sheet.write(row_idx, 1, value)
+
+        # Apply conditional formatting to status; Status is the last row, below the header
+        status_cell = f'B{len(summary_rows) + 1}'
+        if loi_results['status'] == "✅ Pass":
+            summary_sheet.conditional_format(status_cell, {
+                'type': 'cell',
+                'criteria': '==',
+                'value': '"✅ Pass"',
+                'format': pass_format
+            })
+        else:
+            summary_sheet.conditional_format(status_cell, {
+                'type': 'cell',
+                'criteria': '==',
+                'value': '"❌ Fail"',
+                'format': fail_format
+            })
+
+        # Set column widths
+        summary_sheet.set_column('A:A', 25)
+        summary_sheet.set_column('B:B', 20)
+
+    return output.getvalue()
+
+
+def offer_report(state_key, button_key, report_key, build, file_prefix, help_text):
+    """Build an Excel report on request and offer its download while report_key still matches.
+
+    The bytes are kept in st.session_state[state_key] next to report_key, so a repeat
+    click or an unrelated rerun reuses them. build(generated_at) returns the workbook bytes.
+    """
+    report = st.session_state.get(state_key)
+    if report and report['key'] != report_key:
+        report = None
+    if st.button("Generate Excel Report", key=button_key) and report is None:
+        generated_at = datetime.datetime.now()
+        report = st.session_state[state_key] = {
+            'key': report_key,
+            'generated_at': generated_at,
+            'data': build(generated_at)
+        }
+    if report:
+        st.download_button(
+            label="📥 Download Excel Report",
+            data=report['data'],
+            file_name=f"{file_prefix}_{report['generated_at'].strftime('%Y%m%d_%H%M%S')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            help=help_text,
+            on_click="ignore"
+        )
+
+
+# Load measurement images and Brafe logo with error handling
+images = load_images()
+x_img = images['x']
+y_img = images['y']
+z_img = images['z']
+brafe_logo = images['logo']
+for name, path in IMAGE_FILES.items():
+    if images[name] is None:
+        st.warning(f"Image '{path}' not found. Using placeholder.")
+
+# App configuration with updated blue theme
+st.set_page_config(
+    page_title="Brafe Engineering Quality Control",
+    page_icon=brafe_logo if brafe_logo else ":bar_chart:",
+    layout="wide",
+    initial_sidebar_state="expanded"
 )
 
+# Custom CSS for blue Brafe theme
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
 # Sidebar with Brafe branding
 with st.sidebar:
     # Brafe logo
@@ -143,38 +757,44 @@ st.subheader("PDB Process Quality Inspection for Printed Parts")
 
 tab1, tab2, tab3 = st.tabs(["Dimensional Check", "3-Point Bend Test", "Loss on Ignition (LOI)"])
 
-with tab1:
+# Each tab is a fragment, so widget interactions rerun only the tab they belong to
+@st.fragment
+def dimensional_check_tab():
     st.header("Dimensional Measurement Verification")
     st.caption("Verify test bar dimensions according to section 3.3 of Quality Control Manual")
     
-    with st.expander("📏 Measurement Instructions", expanded=True):
-        cols = st.columns(3)
-        with cols[0]:
-            if x_img:
-                st.image(x_img, caption="Measure Dimension X (Length)", use_container_width=True)
-            else:
-                st.markdown("**Image Placeholder: Measure Dimension X (Length)**")
-            st.info("**X-Dimension:**\n- Length direction\n- Nominal: 172 mm")
-        with cols[1]:
-            if y_img:
-                st.image(y_img, caption="Measure Dimension Y (Width)", use_container_width=True)
-            else:
-                st.markdown("**Image Placeholder: Measure Dimension Y (Width)**")
-            st.info("**Y-Dimension:**\n- Width direction\n- Nominal: 22.4 mm")
-        with cols[2]:
-            if z_img:
-                st.image(z_img, caption="Measure Dimension Z (Height)", use_container_width=True)
-            else:
-                st.markdown("**Image Placeholder: Measure Dimension Z (Height)**")
-            st.info("**Z-Dimension:**\n- Height direction\n- Nominal: 22.4 mm")
+    # Tracking the open state lets a collapsed expander skip sending the images
+    instructions = st.expander("📏 Measurement Instructions", expanded=True,
+                               key="measurement_instructions", on_change="rerun")
+    with instructions:
+        if instructions.open:
+            cols = st.columns(3)
+            with cols[0]:
+                if x_img:
+                    st.image(x_img, caption="Measure Dimension X (Length)", width="stretch")
+                else:
+                    st.markdown("**Image Placeholder: Measure Dimension X (Length)**")
+                st.info("**X-Dimension:**\n- Length direction\n- Nominal: 172 mm")
+            with cols[1]:
+                if y_img:
+                    st.image(y_img, caption="Measure Dimension Y (Width)", width="stretch")
+                else:
+                    st.markdown("**Image Placeholder: Measure Dimension Y (Width)**")
+                st.info("**Y-Dimension:**\n- Width direction\n- Nominal: 22.4 mm")
+            with cols[2]:
+                if z_img:
+                    st.image(z_img, caption="Measure Dimension Z (Height)", width="stretch")
+                else:
+                    st.markdown("**Image Placeholder: Measure Dimension Z (Height)**")
+                st.info("**Z-Dimension:**\n- Height direction\n- Nominal: 22.4 mm")
         
-        st.markdown("""
-        **Procedure:**
-        1. Ensure test bar has rested in sand for ≥6 hours
-        2. Clean loose sand from test bar
-        3. Measure each dimension with measuring slide
-        4. Compare with nominal values (tolerance ±0.45mm)
-        """)
+            st.markdown("""
+            **Procedure:**
+            1. Ensure test bar has rested in sand for ≥6 hours
+            2. Clean loose sand from test bar
+            3. Measure each dimension with measuring slide
+            4. Compare with nominal values (tolerance ±0.45mm)
+            """)
     
     st.divider()
     
@@ -207,44 +827,32 @@ with tab1:
         submitted = st.form_submit_button("Verify Dimensions")
         
         if submitted:
-            nominal_x, nominal_y, nominal_z = 172.0, 22.4, 22.4
+            # Check all three dimensions in one vectorized compare
+            measured = np.array([x_measured, y_measured, z_measured])
+            nominal = np.array([172.0, 22.4, 22.4])
             tolerance = 0.45
             
-            x_deviation = x_measured - nominal_x
-            y_deviation = y_measured - nominal_y
-            z_deviation = z_measured - nominal_z
-            
-            x_status = "✅ Pass" if abs(x_deviation) <= tolerance else "❌ Fail"
-            y_status = "✅ Pass" if abs(y_deviation) <= tolerance else "❌ Fail"
-            z_status = "✅ Pass" if abs(z_deviation) <= tolerance else "❌ Fail"
+            deviations = measured - nominal
+            passes = np.abs(deviations) <= tolerance
+            statuses = np.where(passes, "✅ Pass", "❌ Fail")
             
             st.subheader("Verification Results")
             cols = st.columns(3)
-            with cols[0]:
-                st.metric("X-Dimension", f"{x_measured:.1f} mm", 
-                          delta=f"{x_deviation:.1f} mm",
-                          delta_color="normal" if x_status == "✅ Pass" else "inverse")
-                st.markdown(f'<div class="{"pass-metric" if x_status == "✅ Pass" else "fail-metric"}">{x_status}</div>', 
-                            unsafe_allow_html=True)
-            with cols[1]:
-                st.metric("Y-Dimension", f"{y_measured:.1f} mm", 
-                          delta=f"{y_deviation:.1f} mm",
-                          delta_color="normal" if y_status == "✅ Pass" else "inverse")
-                st.markdown(f'<div class="{"pass-metric" if y_status == "✅ Pass" else "fail-metric"}">{y_status}</div>', 
-                            unsafe_allow_html=True)
-            with cols[2]:
-                st.metric("Z-Dimension", f"{z_measured:.1f} mm", 
-                          delta=f"{z_deviation:.1f} mm",
-                          delta_color="normal" if z_status == "✅ Pass" else "inverse")
-                st.markdown(f'<div class="{"pass-metric" if z_status == "✅ Pass" else "fail-metric"}">{z_status}</div>', 
-                            unsafe_allow_html=True)
+            for col, axis, value, deviation, passed, status in zip(cols, "XYZ", measured, deviations,
+                                                                   passes, statuses):
+                with col:
+                    st.metric(f"{axis}-Dimension", f"{value:.1f} mm", 
+                              delta=f"{deviation:.1f} mm",
+                              delta_color="normal" if passed else "inverse")
+                    st.markdown(f'<div class="{"pass-metric" if passed else "fail-metric"}">{status}</div>', 
+                                unsafe_allow_html=True)
             
             # Add total dimension metric
-            total_dimension = x_measured + y_measured + z_measured
+            total_dimension = measured.sum()
             st.markdown("---")
             st.metric("Total Measured Dimensions", f"{total_dimension:.1f} mm")
             
-            if all(status == "✅ Pass" for status in [x_status, y_status, z_status]):
+            if passes.all():
                 st.success("All dimensions within specification!")
             else:
                 st.error("Some dimensions out of tolerance. Check print parameters.")
@@ -255,7 +863,9 @@ with tab1:
                 - Ensure proper printer calibration
                 """)
 
-with tab2:
+
+@st.fragment
+def bend_test_tab():
     st.header("3-Point Bend Test Analysis")
     st.caption("Calculate bending strength according to section 3.4 of Quality Control Manual")
     
@@ -273,157 +883,155 @@ with tab2:
                                   help="Should contain force measurements in last column (Newtons)")
     
     if bend_files:
+        # Dimensions and report sheets are keyed by filename, so only the first upload
+        # of each name is used
+        unique_files = {}
+        for bend_file in bend_files:
+            if bend_file.name in unique_files:
+                st.warning(f"Ignoring duplicate upload of {bend_file.name}; only the first one is used")
+            else:
+                unique_files[bend_file.name] = bend_file
+        bend_files = list(unique_files.values())
+        
         # Initialize lists to store results
         results = []
         dfs = []
-        dimension_entries = []
-        graphs = []  # Store graph images for Excel
+        dimension_entries = {}
         
         # Create dimension input section
         with st.expander("⚙️ Set Test Bar Dimensions for Each File", expanded=True):
-            st.subheader("Enter Dimensions for Each Test Bar (mm)")
-            
-            # Create columns for headers
-            header_cols = st.columns([3, 2, 2, 2])
-            header_cols[0].markdown("**Filename**")
-            header_cols[1].markdown("**Support Span (L)**")
-            header_cols[2].markdown("**Width (b)**")
-            header_cols[3].markdown("**Height (h)**")
-            
-            # Create input rows for each file
-            for i, bend_file in enumerate(bend_files):
-                filename = bend_file.name
-                cols = st.columns([3, 2, 2, 2])
-                
-                # Filename display
-                cols[0].markdown(f"`{filename}`")
-                
-                # Dimension inputs with saved state
-                key_prefix = f"dim_{i}"
-                
-                # Try to get saved dimensions or use defaults
-                default_L = st.session_state.file_dimensions.get(f"{filename}_L", 172.0)
-                default_b = st.session_state.file_dimensions.get(f"{filename}_b", 22.4)
-                default_h = st.session_state.file_dimensions.get(f"{filename}_h", 22.4)
-                
-                L = cols[1].number_input("L", 
-                                         min_value=1.0,
-                                         value=default_L,
-                                         step=0.1,
-                                         format="%.1f",
-                                         key=f"{key_prefix}_L",
-                                         label_visibility="collapsed")
-                b = cols[2].number_input("b", 
-                                         min_value=1.0,
-                                         value=default_b,
-                                         step=0.1,
-                                         format="%.1f",
-                                         key=f"{key_prefix}_b",
-                                         label_visibility="collapsed")
-                h = cols[3].number_input("h", 
-                                         min_value=1.0,
-                                         value=default_h,
-                                         step=0.1,
-                                         format="%.1f",
-                                         key=f"{key_prefix}_h",
-                                         label_visibility="collapsed")
-                
-                # Save dimensions in session state
-                st.session_state.file_dimensions[f"{filename}_L"] = L
-                st.session_state.file_dimensions[f"{filename}_b"] = b
-                st.session_state.file_dimensions[f"{filename}_h"] = h
-                
-                dimension_entries.append({
-                    'filename': filename,
-                    'L': L,
-                    'b': b,
-                    'h': h
-                })
+            # A form batches edits to all bars into one rerun when they are applied
+            with st.form("bend_dimensions"):
+                st.subheader("Enter Dimensions for Each Test Bar (mm)")
+
+                # Create columns for headers
+                header_cols = st.columns([3, 2, 2, 2])
+                header_cols[0].markdown("**Filename**")
+                header_cols[1].markdown("**Support Span (L)**")
+                header_cols[2].markdown("**Width (b)**")
+                header_cols[3].markdown("**Height (h)**")
+
+                # Create input rows for each file
+                for i, bend_file in enumerate(bend_files):
+                    filename = bend_file.name
+                    cols = st.columns([3, 2, 2, 2])
+
+                    # Filename display
+                    cols[0].markdown(f"`{filename}`")
+
+                    # Dimension inputs with saved state
+                    key_prefix = f"dim_{i}"
+
+                    # Try to get saved dimensions or use defaults
+                    default_L = st.session_state.file_dimensions.get(f"{filename}_L", 172.0)
+                    default_b = st.session_state.file_dimensions.get(f"{filename}_b", 22.4)
+                    default_h = st.session_state.file_dimensions.get(f"{filename}_h", 22.4)
+
+                    L = cols[1].number_input("L",
+                                             min_value=1.0,
+                                             value=default_L,
+                                             step=0.1,
+                                             format="%.1f",
+                                             key=f"{key_prefix}_L",
+                                             label_visibility="collapsed")
+                    b = cols[2].number_input("b",
+                                             min_value=1.0,
+                                             value=default_b,
+                                             step=0.1,
+                                             format="%.1f",
+                                             key=f"{key_prefix}_b",
+                                             label_visibility="collapsed")
+                    h = cols[3].number_input("h",
+                                             min_value=1.0,
+                                             value=default_h,
+                                             step=0.1,
+                                             format="%.1f",
+                                             key=f"{key_prefix}_h",
+                                             label_visibility="collapsed")
+
+                    # Save dimensions in session state
+                    st.session_state.file_dimensions[f"{filename}_L"] = L
+                    st.session_state.file_dimensions[f"{filename}_b"] = b
+                    st.session_state.file_dimensions[f"{filename}_h"] = h
+
+                    dimension_entries[filename] = {'L': L, 'b': b, 'h': h}
+
+                st.form_submit_button("Apply Dimensions")
         
         st.divider()
         
-        # Process each file
-        for i, bend_file in enumerate(bend_files):
+        def show_file_error(filename, error):
+            st.error(f"Error processing file {filename}: {str(error)}")
+            st.info("""
+            **Required CSV Format:**
+            - Must have at least 6 columns
+            - 6th column should contain force values in Newtons (N)
+            - Example row: `-10.7649,0,0,1.064,1.064,10.7649`
+            """)
+
+        # Read and validate each file first so strengths can be computed for all of them
+        # at once; a file's problem is shown in its place among the results below
+        loaded = {}
+        problems = {}
+        for bend_file in bend_files:
             filename = bend_file.name
             try:
                 # Get dimensions for this file
-                dims = next((d for d in dimension_entries if d['filename'] == filename), None)
+                dims = dimension_entries.get(filename)
                 if not dims:
-                    st.warning(f"No dimensions found for {filename}")
+                    problems[filename] = partial(st.warning, f"No dimensions found for {filename}")
                     continue
-                    
-                L = dims['L']
-                b = dims['b']
-                h = dims['h']
-                
-                # Read CSV - handle trailing commas
-                df = pd.read_csv(bend_file, header=None)
                 
-                # Fix for files with trailing commas (like the example)
-                # Remove any empty columns at the end
-                df = df.dropna(axis=1, how='all')
+                # Read and clean CSV (cached on the file contents across reruns)
+                df, max_force_n = load_bend_data(bend_file.getvalue())
                 
                 # Validate column count
                 if len(df.columns) < 6:
-                    st.error(f"File '{filename}' has only {len(df.columns)} columns. Expected at least 6 columns.")
+                    problems[filename] = partial(st.error, f"File '{filename}' has only {len(df.columns)} columns. Expected at least 6 columns.")
                     continue
-                    
-                # Rename columns - use 6th column for force (index 5)
-                df.columns = [f'col_{i}' for i in range(len(df.columns))]
-                df['force_n'] = df.iloc[:, 5]  # Use 6th column as force
-                
-                # Clean data
-                df = df.replace([np.inf, -np.inf], np.nan).dropna(subset=['force_n'])
-                df['force_n'] = pd.to_numeric(df['force_n'], errors='coerce')
-                df = df.dropna(subset=['force_n'])
-                
-                # Enhanced filtering
-                # 1. Remove negative values (force should be positive)
-                df = df[df['force_n'] >= 0]
-                
-                # 2. Remove extreme outliers (more than 3 std devs from mean)
-                mean_force = df['force_n'].mean()
-                std_force = df['force_n'].std()
-                if std_force > 0:  # Avoid division by zero
-                    df = df[df['force_n'] <= mean_force + 3 * std_force]
-                
-                # 3. Remove values that are too high before the main test starts
-                # Find the first significant force value (>1% of max)
-                if not df.empty:
-                    max_force = df['force_n'].max()
-                    threshold = max_force * 0.01
-                    start_index = df[df['force_n'] > threshold].index.min()
-                    if pd.notnull(start_index):
-                        df = df.loc[start_index:]
                 
                 if df.empty:
-                    st.warning(f"File '{filename}' does not contain valid force data after cleaning")
+                    problems[filename] = partial(st.warning, f"File '{filename}' does not contain valid force data after cleaning")
                     continue
                 
-                # Find peak force
-                max_force_n = df['force_n'].max()
-                
-                # Calculate bending strength in N/cm²
-                # Formula: σ = (3 * F * L) / (2 * b * h²)
-                # Convert mm to cm: 1 mm = 0.1 cm
-                L_cm = L * 0.1
-                b_cm = b * 0.1
-                h_cm = h * 0.1
-                
-                bending_strength = (3 * max_force_n * L_cm) / (2 * b_cm * h_cm**2)
-                status = "✅ Pass" if bending_strength >= nominal_strength else "❌ Fail"
-                
+                loaded[filename] = {'L': dims['L'], 'b': dims['b'], 'h': dims['h'],
+                                    'df': df, 'max_force': max_force_n}
+
+            except Exception as e:
+                problems[filename] = partial(show_file_error, filename, e)
+        
+        # Calculate bending strength in N/cm² for every bar in one pass
+        # Formula: σ = (3 * F * L) / (2 * b * h²)
+        # Convert mm to cm: 1 mm = 0.1 cm
+        entries = list(loaded.values())
+        forces = np.array([entry['max_force'] for entry in entries], dtype=np.float64)
+        L_cm = np.array([entry['L'] for entry in entries], dtype=np.float64) * 0.1
+        b_cm = np.array([entry['b'] for entry in entries], dtype=np.float64) * 0.1
+        h_cm = np.array([entry['h'] for entry in entries], dtype=np.float64) * 0.1
+        
+        strengths = (3 * forces * L_cm) / (2 * b_cm * h_cm**2)
+        statuses = np.where(strengths >= nominal_strength, "✅ Pass", "❌ Fail")
+        for entry, bending_strength, status in zip(entries, strengths.tolist(), statuses.tolist()):
+            entry['strength'] = bending_strength
+            entry['status'] = status
+        
+        for bend_file in bend_files:
+            filename = bend_file.name
+            if filename in problems:
+                problems[filename]()
+                continue
+            entry = loaded[filename]
+            L, b, h, df = entry['L'], entry['b'], entry['h'], entry['df']
+            max_force_n = entry['max_force']
+            bending_strength = entry['strength']
+            status = entry['status']
+            # Render each bar in its own handler so one failure stays beside its file
+            try:
                 # Extract part ID and job number from filename
-                try:
-                    # Example filename: 2025_0731_1110221A(1).csv
-                    # Extract date and identifier
-                    date_part = filename.split("_")[0] + "_" + filename.split("_")[1]
-                    identifier = filename.split("_")[2].split("(")[0]
-                    job_no = filename.split("(")[1].split(")")[0] if "(" in filename else "N/A"
-                    part_id = f"{date_part}_{identifier}"
-                except:
-                    part_id = "Unknown"
-                    job_no = "N/A"
+                part_match = FILENAME_PART_RE.match(filename)
+                part_id = f"{part_match[1]}_{part_match[2]}" if part_match else "Unknown"
+                job_match = FILENAME_JOB_RE.search(filename)
+                job_no = job_match[1] if job_match else "N/A"
 
                 # Store results
                 results.append({
@@ -447,27 +1055,16 @@ with tab2:
                 col3.metric("Bending Strength", f"{bending_strength:.2f} N/cm²", 
                             delta="Pass" if status == "✅ Pass" else "Fail",
                             delta_color="normal" if status == "✅ Pass" else "inverse")
-                
+            
                 # Quality status with styling
                 status_html = f'<div class="{"pass-metric" if status == "✅ Pass" else "fail-metric"}">{status}</div>'
                 st.markdown(status_html, unsafe_allow_html=True)
-                
-                # Create force progression plot
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.plot(df.index, df['force_n'], label='Force (N)', color='#00509d')
-                ax.axhline(y=max_force_n, color='r', linestyle='--', label='Max Force')
-                ax.set_xlabel('Data Point Index')
-                ax.set_ylabel('Force (N)')
-                ax.set_title(f'Force Progression for {filename}')
-                ax.legend()
-                ax.grid(True, linestyle='--', alpha=0.7)
-                st.pyplot(fig)
-                
-                # Save plot for Excel
-                img_buffer = BytesIO()
-                plt.savefig(img_buffer, format='png', dpi=300)
-                plt.close(fig)
-                graphs.append((filename, img_buffer))
+            
+                # Create force progression plot; the browser draws it, so only the
+                # decimated trace is sent
+                plot_x, plot_y = decimate(df.index.to_numpy(dtype=np.float64),
+                                          df['force_n'].to_numpy(dtype=np.float64))
+                st.altair_chart(force_chart(plot_x, plot_y, max_force_n, filename), width="stretch")
 
                 if bending_strength < nominal_strength:
                     st.warning("""
@@ -479,339 +1076,39 @@ with tab2:
                     """)
 
             except Exception as e:
-                st.error(f"Error processing file {filename}: {str(e)}")
-                st.info("""
-                **Required CSV Format:**
-                - Must have at least 6 columns
-                - 6th column should contain force values in Newtons (N)
-                - Example row: `-10.7649,0,0,1.064,1.064,10.7649`
-                """)
+                show_file_error(filename, e)
 
         # Display summary table
         if results:
             st.subheader("Test Summary")
             summary_df = pd.DataFrame(results)
-            st.dataframe(summary_df.style.format({
-                'L (mm)': '{:.1f}',
-                'b (mm)': '{:.1f}',
-                'h (mm)': '{:.1f}',
-                'Max Force (N)': '{:.2f}',
-                'Bending Strength (N/cm²)': '{:.2f}'
-            }).applymap(lambda x: 'background-color: #d4edda' if x == '✅ Pass' else 'background-color: #ffcccc', 
-                      subset=['Status']))
-
-            # Generate combined Excel report
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                # Get the workbook object
-                workbook = writer.book
-                
-                # ===================================================
-                # ========== Create Professional Front Page ==========
-                # ===================================================
-                front_sheet = workbook.add_worksheet('Test Summary')
-                
-                # Define professional formats
-                title_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 18,
-                    'bold': True,
-                    'align': 'center',
-                    'valign': 'vcenter',
-                    'bottom': 6
-                })
-                
-                header_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 12,
-                    'bold': True,
-                    'bg_color': '#003366',
-                    'font_color': 'white',
-                    'border': 1,
-                    'align': 'center',
-                    'valign': 'vcenter'
-                })
-                
-                subheader_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 14,
-                    'bold': True,
-                    'align': 'left'
-                })
-                
-                info_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 11,
-                    'align': 'left',
-                    'text_wrap': True
-                })
-                
-                parameter_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 11,
-                    'bold': True,
-                    'align': 'left',
-                    'bg_color': '#e6f0f9'
-                })
-                
-                value_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 11,
-                    'align': 'left',
-                    'border': 1
-                })
-                
-                number_format = workbook.add_format({
-                    'font_name': 'Calibri',
-                    'font_size': 11,
-                    'num_format': '0.00',
-                    'align': 'left',
-                    'border': 1
-                })
-                
-                # Set column widths
-                front_sheet.set_column('A:A', 2)  # Padding
-                front_sheet.set_column('B:B', 25)  # Labels
-                front_sheet.set_column('C:C', 25)  # Values
-                front_sheet.set_column('D:D', 2)  # Padding
-                
-                # Add title and company info
-                front_sheet.merge_range('B1:D1', 'Brafe Engineering - Bend Test Report', title_format)
-                front_sheet.merge_range('B3:D3', 'Quality Control Department', info_format)
-                front_sheet.merge_range('B4:D4', f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", info_format)
-                
-                # Add test parameters section
-                front_sheet.merge_range('B6:D6', 'Test Parameters', subheader_format)
-                
-                # Get operator and test ID from session state
-                operator_name = st.session_state.get("operator_name", "Unknown Operator")
-                test_id = st.session_state.get("test_id", "Unknown Test ID")
-                
-                # Add parameter table
-                test_date = datetime.datetime.now().strftime('%Y-%m-%d')
-                parameters = [
-                    ("Test ID", test_id),
-                    ("Operator", operator_name),
-                    ("Test Date", test_date),
-                    ("Nominal Strength", f"{nominal_strength} N/cm²")
-                ]
-                
-                for row_idx, (param, value) in enumerate(parameters, start=7):
-                    front_sheet.write(row_idx, 1, param, parameter_format)
-                    front_sheet.write(row_idx, 2, value, value_format)
-                
-                # Add test summary section
-                front_sheet.merge_range('B13:D13', 'Test Results Summary', subheader_format)
-                
-                # Add summary table if results exist
-                if results:
-                    # Write headers
-                    headers = ["Filename", "Part ID", "Job No", "Strength (N/cm²)", "Status"]
-                    for col_idx, header in enumerate(headers, start=1):
-                        front_sheet.write(14, col_idx, header, header_format)
-                    
-                    # Write data
-                    for row_idx, result in enumerate(results, start=15):
-                        front_sheet.write(row_idx, 1, result['Filename'], value_format)
-                        front_sheet.write(row_idx, 2, result['Part ID'], value_format)
-                        front_sheet.write(row_idx, 3, result['Job No'], value_format)
-                        front_sheet.write_number(row_idx, 4, result['Bending Strength (N/cm²)'], number_format)
-                        
-                        # Apply conditional formatting for status
-                        if result['Status'] == "✅ Pass":
-                            status_format = workbook.add_format({
-                                'font_color': '#155724',
-                                'bg_color': '#d4edda',
-                                'border': 1
-                            })
-                        else:
-                            status_format = workbook.add_format({
-                                'font_color': '#721c24',
-                                'bg_color': '#f8d7da',
-                                'border': 1
-                            })
-                        front_sheet.write(row_idx, 5, result['Status'], status_format)
-                    
-                    # Add statistics
-                    strengths = [r['Bending Strength (N/cm²)'] for r in results]
-                    if strengths:
-                        avg_strength = sum(strengths) / len(strengths)
-                        min_strength = min(strengths)
-                        max_strength = max(strengths)
-                        
-                        front_sheet.merge_range(f'B{16+len(results)}:C{16+len(results)}', 'Average Strength', parameter_format)
-                        front_sheet.write_number(15+len(results), 4, avg_strength, number_format)
-                        
-                        front_sheet.merge_range(f'B{17+len(results)}:C{17+len(results)}', 'Minimum Strength', parameter_format)
-                        front_sheet.write_number(16+len(results), 4, min_strength, number_format)
-                        
-                        front_sheet.merge_range(f'B{18+len(results)}:C{18+len(results)}', 'Maximum Strength', parameter_format)
-                        front_sheet.write_number(17+len(results), 4, max_strength, number_format)
-                
-                # Add footer note
-                note = "Note: Complete test data available in subsequent sheets"
-                front_sheet.merge_range(f'B{20+len(results)}:D{20+len(results)}', note, info_format)
-                
-                # ===================================================
-                # ========== Create Breaking Force Sheet =============
-                # ===================================================
-                if results:
-                    breaking_force_sheet = workbook.add_worksheet('Breaking Force')
-                    
-                    # Create header
-                    breaking_force_sheet.merge_range('A1:E1', 'Breaking Force Measurements', title_format)
-                    breaking_force_sheet.write_row(2, 0, ['Filename', 'Part ID', 'Job No', 'Max Force (N)', 'Status'], header_format)
-                    
-                    # Write data
-                    for row_idx, result in enumerate(results, start=3):
-                        breaking_force_sheet.write(row_idx, 0, result['Filename'], value_format)
-                        breaking_force_sheet.write(row_idx, 1, result['Part ID'], value_format)
-                        breaking_force_sheet.write(row_idx, 2, result['Job No'], value_format)
-                        breaking_force_sheet.write_number(row_idx, 3, result['Max Force (N)'], number_format)
-                        
-                        # Apply conditional formatting for status
-                        if result['Status'] == "✅ Pass":
-                            status_format = workbook.add_format({
-                                'font_color': '#155724',
-                                'bg_color': '#d4edda'
-                            })
-                        else:
-                            status_format = workbook.add_format({
-                                'font_color': '#721c24',
-                                'bg_color': '#f8d7da'
-                            })
-                        breaking_force_sheet.write(row_idx, 4, result['Status'], status_format)
-                    
-                    # Format columns
-                    breaking_force_sheet.set_column('A:A', 30)
-                    breaking_force_sheet.set_column('B:B', 20)
-                    breaking_force_sheet.set_column('C:C', 15)
-                    breaking_force_sheet.set_column('D:D', 15)
-                    breaking_force_sheet.set_column('E:E', 10)
-                
-                # ===================================================
-                # ========== Create Sheets for Each Test ============
-                # ===================================================
-                if results and dfs:
-                    for idx, (filename, df) in enumerate(dfs):
-                        # Create base name for sheets
-                        base_name = re.sub(r'[\[\]:*?/\\]', '_', filename)[:20]
-                        
-                        # Create parameter sheet
-                        param_sheet_name = base_name + "_Params"
-                        param_sheet = workbook.add_worksheet(param_sheet_name[:31])
-                        
-                        # Add header
-                        param_sheet.merge_range('A1:C1', f'Test Parameters: {filename}', title_format)
-                        param_sheet.write_row(2, 0, ['Parameter', 'Value', 'Status'], header_format)
-                        
-                        # Get specific values for this file
-                        file_result = next((r for r in results if r['Filename'] == filename), {})
-                        
-                        # Prepare parameters
-                        test_params = [
-                            ("Test ID", test_id, ""),
-                            ("Operator", operator_name, ""),
-                            ("Test Date", test_date, ""),
-                            ("Part ID", file_result.get('Part ID', 'N/A'), ""),
-                            ("Job No", file_result.get('Job No', 'N/A'), ""),
-                            ("Support Span (L)", f"{file_result.get('L (mm)', 0):.1f} mm", ""),
-                            ("Width (b)", f"{file_result.get('b (mm)', 0):.1f} mm", ""),
-                            ("Height (h)", f"{file_result.get('h (mm)', 0):.1f} mm", ""),
-                            ("Max Force", f"{file_result.get('Max Force (N)', 0):.2f} N", ""),
-                            ("Bending Strength", f"{file_result.get('Bending Strength (N/cm²)', 0):.2f} N/cm²", ""),
-                            ("Status", "", file_result.get('Status', 'N/A'))
-                        ]
-                        
-                        # Write parameters
-                        for row_idx, (param, value, status) in enumerate(test_params, start=3):
-                            param_sheet.write(row_idx, 0, param, parameter_format)
-                            param_sheet.write(row_idx, 1, value, value_format)
-                            
-                            # Apply status formatting
-                            if status == "✅ Pass":
-                                status_format = workbook.add_format({
-                                    'font_color': '#155724',
-                                    'bg_color': '#d4edda',
-                                    'border': 1
-                                })
-                            else:
-                                status_format = workbook.add_format({
-                                    'font_color': '#721c24',
-                                    'bg_color': '#f8d7da',
-                                    'border': 1
-                                })
-                            param_sheet.write(row_idx, 2, status, status_format)
-                        
-                        # Set column widths
-                        param_sheet.set_column('A:A', 25)
-                        param_sheet.set_column('B:B', 20)
-                        param_sheet.set_column('C:C', 15)
-                        
-                        # Create raw data sheet
-                        data_sheet_name = base_name + "_Data"
-                        raw_sheet = workbook.add_worksheet(data_sheet_name[:31])
-                        
-                        # Add header
-                        raw_sheet.merge_range('A1:Z1', f'Raw Test Data: {filename}', title_format)
-                        
-                        # Write raw data headers
-                        headers = df.columns.tolist()
-                        raw_sheet.write_row(2, 0, headers, header_format)
-                        
-                        # Write raw data
-                        for row_idx, row in enumerate(df.values):
-                            for col_idx, value in enumerate(row):
-                                if isinstance(value, float):
-                                    raw_sheet.write_number(row_idx + 3, col_idx, value, number_format)
-                                else:
-                                    raw_sheet.write_string(row_idx + 3, col_idx, str(value), value_format)
-                        
-                        # Freeze header row
-                        raw_sheet.freeze_panes(3, 0)
-                        
-                        # Add chart
-                        if not df.empty:
-                            chart = workbook.add_chart({'type': 'line'})
-                            chart.add_series({
-                                'values': [data_sheet_name, 3, 5, 3 + len(df), 5],
-                                'name': 'Force (N)',
-                                'line': {'color': '#003366', 'width': 1.5}
-                            })
-                            
-                            # Find max force value and position
-                            max_force = df['force_n'].max()
-                            max_index = df['force_n'].idxmax() + 3  # +3 for header offset
-                            
-                            # Add max force marker
-                            chart.add_series({
-                                'values': [data_sheet_name, max_index, 5, max_index, 5],
-                                'name': 'Max Force',
-                                'marker': {'type': 'circle', 'size': 6, 'fill': {'color': '#FF0000'}},
-                                'line': {'none': True}
-                            })
-                            
-                            chart.set_title({'name': f'Force Progression: {filename}'})
-                            chart.set_x_axis({'name': 'Data Point Index'})
-                            chart.set_y_axis({'name': 'Force (N)'})
-                            chart.set_legend({'position': 'top'})
-                            
-                            # Insert chart below data
-                            raw_sheet.insert_chart(f'G{len(df) + 10}', chart)
-
-            # Only show download button if we have results
-            if results:
-                st.download_button(
-                    label="📥 Download Excel Report",
-                    data=output.getvalue(),
-                    file_name=f"Brafe_BendTest_Report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    help="Download comprehensive test report in Excel format"
-                )
-            else:
-                st.warning("No test results available to generate report")
-         
-with tab3:
+            # Formatted in the browser through column_config rather than a pandas Styler
+            st.dataframe(summary_df, column_config={
+                'L (mm)': st.column_config.NumberColumn(format='%.1f'),
+                'b (mm)': st.column_config.NumberColumn(format='%.1f'),
+                'h (mm)': st.column_config.NumberColumn(format='%.1f'),
+                'Max Force (N)': st.column_config.NumberColumn(format='%.2f'),
+                'Bending Strength (N/cm²)': st.column_config.NumberColumn(format='%.2f')
+            })
+
+            # Generate combined Excel report only on request, reused while the uploads,
+            # dimensions, operator and test ID are unchanged
+            operator_name = st.session_state.get("operator_name", "Unknown Operator")
+            test_id = st.session_state.get("test_id", "Unknown Test ID")
+            report_key = ([bend_file.file_id for bend_file in bend_files], results,
+                          operator_name, test_id, nominal_strength)
+            offer_report('bend_report', "bend_report_button", report_key,
+                         lambda generated_at: build_bend_report(results, dfs, operator_name, test_id,
+                                                                nominal_strength, generated_at),
+                         "Brafe_BendTest_Report",
+                         "Download comprehensive test report in Excel format")
+        else:
+            # Nothing usable was uploaded, so no report is offered or built
+            st.warning("No valid test results to report. Check the files listed above.")
+
+
+@st.fragment
+def loi_tab():
     st.header("Loss on Ignition (LOI) Analysis")
     st.caption("Calculate binder content according to section 3.5 of Quality Control Manual")
     
@@ -849,29 +1146,31 @@ with tab3:
         
         if submitted:
             try:
-                # The manual's formula, which uses absolute values of tared bowl weights,
-                # is not standard but is implemented as specified.
-                delta_m = (abs(t2) - abs(t1)) - w1
-                loi = (abs(delta_m) / w1) * 100
-                
-                # Store results in session state
-                st.session_state.loi_results = {
-                    'delta_m': abs(delta_m),
-                    'loi': loi,
-                    'status': "✅ Pass" if 0.5 <= loi <= 2.5 else "❌ Fail",
-                    't1': t1,
-                    'w1': w1,
-                    't2': t2
-                }
+                # Only recompute when the inputs changed since the last submit
+                loi_key = (t1, w1, t2)
+                if st.session_state.get('loi_key') != loi_key:
+                    delta_m, loi = compute_loi(t1, w1, t2)
+                    
+                    # Store results in session state
+                    st.session_state.loi_results = {
+                        'delta_m': float(delta_m),
+                        'loi': float(loi),
+                        'status': "✅ Pass" if 0.5 <= loi <= 2.5 else "❌ Fail",
+                        't1': t1,
+                        'w1': w1,
+                        't2': t2
+                    }
+                    st.session_state.loi_key = loi_key
+                loi_results = st.session_state.loi_results
                 
                 st.divider()
                 st.subheader("Results")
                 
                 col1, col2 = st.columns(2)
-                col1.metric("Mass Loss (Δm)", f"{abs(delta_m):.3f} g")
-                col2.metric("Loss on Ignition", f"{loi:.2f} %")
+                col1.metric("Mass Loss (Δm)", f"{loi_results['delta_m']:.3f} g")
+                col2.metric("Loss on Ignition", f"{loi_results['loi']:.2f} %")
                 
-                status = "✅ Pass" if 0.5 <= loi <= 2.5 else "❌ Fail"
+                status = loi_results['status']
                 st.markdown(f'<div class="{"pass-metric" if status == "✅ Pass" else "fail-metric"}">{status} - {"Optimal binder content" if status == "✅ Pass" else "Out of optimal range"}</div>', 
                             unsafe_allow_html=True)
                 
@@ -896,79 +1195,14 @@ with tab3:
         operator_name = st.session_state.get("operator_name", "Unknown Operator")
         test_id = st.session_state.get("test_id", "Unknown Test ID")
         
-        # Generate Excel report in Brafe template format
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            # Create summary sheet
-            summary_df = pd.DataFrame({
-                'Parameter': ['Test Date', 'Operator', 'Test ID', 
-                              'Method', 'T1 (g)', 'W1 (g)', 'T2 (g)',
-                              'Mass Loss (g)', 'LOI (%)', 'Status'],
-                'Value': [datetime.datetime.now().strftime('%Y-%m-%d'), 
-                          operator_name, 
-                          test_id,
-                          method, 
-                          st.session_state.loi_results['t1'], 
-                          st.session_state.loi_results['w1'], 
-                          st.session_state.loi_results['t2'],
-                          st.session_state.loi_results['delta_m'], 
-                          st.session_state.loi_results['loi'], 
-                          st.session_state.loi_results['status']]
-            })
-            summary_df.to_excel(writer, sheet_name='Test Summary', index=False, startrow=1)
-            
-            # Formatting
-            workbook = writer.book
-            summary_sheet = writer.sheets['Test Summary']
-            
-            # Formatting
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#003366',
-                'font_color': 'white',
-                'border': 1
-            })
-            pass_format = workbook.add_format({
-                'bg_color': '#d4edda',
-                'font_color': '#155724'
-            })
-            fail_format = workbook.add_format({
-                'bg_color': '#f8d7da',
-                'font_color': '#721c24'
-            })
-            
-            # Apply header formatting
-            for col_num, value in enumerate(summary_df.columns.values):
-                summary_sheet.write(0, col_num, value, header_format)
-            
-            # Apply conditional formatting to status
-            status_row = summary_df.index[summary_df['Parameter'] == 'Status'].tolist()[0] + 1
-            if st.session_state.loi_results['status'] == "✅ Pass":
-                summary_sheet.conditional_format(f'B{status_row+1}', {
-                    'type': 'cell',
-                    'criteria': '==',
-                    'value': '"✅ Pass"',
-                    'format': pass_format
-                })
-            else:
-                summary_sheet.conditional_format(f'B{status_row+1}', {
-                    'type': 'cell',
-                    'criteria': '==',
-                    'value': '"❌ Fail"',
-                    'format': fail_format
-                })
-            
-            # Set column widths
-            summary_sheet.set_column('A:A', 25)
-            summary_sheet.set_column('B:B', 20)
-        
-        st.download_button(
-            label="📥 Download Excel Report",
-            data=output.getvalue(),
-            file_name=f"Brafe_LOI_Report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            help="Download LOI test report in Excel format"
-        )
+        # Generate Excel report in Brafe template format only on request, reused while
+        # the readings, method, operator and test ID are unchanged
+        report_key = (st.session_state.loi_key, method, operator_name, test_id)
+        offer_report('loi_report', "loi_report_button", report_key,
+                     lambda generated_at: build_loi_report(st.session_state.loi_results, method,
+                                                           operator_name, test_id, generated_at),
+                     "Brafe_LOI_Report",
+                     "Download LOI test report in Excel format")
     
     st.divider()
     st.subheader("LOI Formula Reference")
@@ -980,6 +1214,16 @@ with tab3:
     ''')
     st.caption("Note: Algebraic signs are not considered in calculations (per manual section 3.5)")
 
+
+with tab1:
+    dimensional_check_tab()
+
+with tab2:
+    bend_test_tab()
+
+with tab3:
+    loi_tab()
+
 # Footer with Brafe branding
 st.divider()
 st.caption("""